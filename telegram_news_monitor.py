@@ -1,19 +1,40 @@
 import asyncio
+import functools
 import platform
 import logging
+import string
+import sys
+import time
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional, Set
+from typing import Iterable, List, Dict, Mapping, Optional, Set, Tuple
 from collections import defaultdict
 import os
 import uuid
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from types import MappingProxyType
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from pydantic_ai import Agent, RunContext
-from telethon import TelegramClient, events
-from telethon.tl.types import Message
+from asyncio_throttle import Throttler
+from telethon import TelegramClient, events, utils
+from telethon.tl.types import InputPeerChannel, Message
 from dotenv import load_dotenv
 
+try:  # Optional: exact token counts for prompt budgeting
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+try:  # Optional: semantic caching of topic detection results
+    import numpy as np
+except ImportError:
+    np = None
+
+try:  # Installing it also installs numpy
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -23,20 +44,66 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Topic detection calls, bounded to stay within the LLM provider's limits
+LLM_MAX_CONCURRENCY = 5
+LLM_RATE_LIMIT = 25  # Requests per LLM_RATE_PERIOD seconds
+LLM_RATE_PERIOD = 60
+
+# Most recent messages kept per side of a detected topic
+TOPIC_MESSAGE_CAP = 500
+
+# Default age after which topics, and the seen message ids behind them, expire
+TOPIC_RETENTION_HOURS = 24
+
+# Prompt budget per political side, in tokens
+PROMPT_TOKEN_BUDGET = 1500
+PROMPT_TOKENIZER_ENCODING = "cl100k_base"
+
+# Local gates that avoid LLM calls on batches unlikely to share a topic
+MIN_SHARED_TERMS = 2  # Words (longer than 3 chars) both prompt sides must share
+PROMPT_MIN_TOKENS = 200  # Smaller batches are deferred and merged with the next
+
+_TERM_PUNCTUATION = string.punctuation + "״׳“”–"
+
+# Per-pair topic detection prompt, filled with the packed message blocks
+_PROMPT_TEMPLATE = """
+זהה נושא משותף בהודעות הללו:
+
+הודעות ימין:
+{right_block}
+
+הודעות שמאל:
+{left_block}
+
+האם יש נושא אחד שנדון בשני הצדדים? אם כן, תן לו שם קצר בעברית.
+"""
+
+# Semantic cache for topic detection (skips the LLM on near-duplicate prompts)
+SEMANTIC_CACHE_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.87  # Minimum cosine similarity, on both sides, for a hit
+SEMANTIC_CACHE_SIZE = 512  # Entries kept before LRU eviction
+
+
+# Valid channel affiliations
+_AFFILIATIONS = frozenset({"right-wing", "left-wing"})
+
 
 # Pydantic Models
 class ChannelConfig(BaseModel):
     """Configuration for a Telegram channel"""
 
+    model_config = ConfigDict(frozen=True)
+
     name: str = Field(..., description="Human-readable name of the channel")
     tg_chan_name: str = Field(..., description="Telegram channel name (without @)")
     affiliation: str = Field(
         ..., description="Political affiliation: 'right-wing' or 'left-wing'"
     )
 
-    @validator("affiliation")
+    @field_validator("affiliation")
+    @classmethod
     def validate_affiliation(cls, v):
-        if v not in ["right-wing", "left-wing"]:
+        if v not in _AFFILIATIONS:
             raise ValueError('Affiliation must be either "right-wing" or "left-wing"')
         return v
 
@@ -44,6 +111,8 @@ class ChannelConfig(BaseModel):
 class TelegramMessage(BaseModel):
     """Structured representation of a Telegram message"""
 
+    model_config = ConfigDict(frozen=True)
+
     id: int
     text: str
     timestamp: datetime
@@ -51,6 +120,47 @@ class TelegramMessage(BaseModel):
     channel_affiliation: str
 
 
+@dataclass
+class MessageBatch:
+    """Column-oriented batch of fetched messages (one list per field)"""
+
+    ids: List[int] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    affils: List[str] = field(default_factory=list)
+    channels: List[str] = field(default_factory=list)
+    timestamps: List[datetime] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, channel: ChannelConfig, msg: Message):
+        """Add a Telethon message from the given channel"""
+        self.ids.append(msg.id)
+        self.texts.append(msg.text)
+        self.affils.append(channel.affiliation)
+        self.channels.append(channel.name)
+        self.timestamps.append(msg.date)
+
+    def extend(self, other: "MessageBatch"):
+        """Append all rows of another batch"""
+        self.ids.extend(other.ids)
+        self.texts.extend(other.texts)
+        self.affils.extend(other.affils)
+        self.channels.extend(other.channels)
+        self.timestamps.extend(other.timestamps)
+
+    def message(self, i: int) -> TelegramMessage:
+        """Materialize row i as a TelegramMessage"""
+        # Trusted Telethon data, so skip field validation
+        return TelegramMessage.model_construct(
+            id=self.ids[i],
+            text=self.texts[i],
+            timestamp=self.timestamps[i],
+            channel_name=self.channels[i],
+            channel_affiliation=self.affils[i],
+        )
+
+
 class TopicDetectionResult(BaseModel):
     """Result of topic detection analysis"""
 
@@ -78,6 +188,8 @@ class DetectedTopic(BaseModel):
 class AppConfig(BaseModel):
     """Application configuration"""
 
+    model_config = ConfigDict(frozen=True)  # Shared via the load_config cache
+
     telegram_api_id: int
     telegram_api_hash: str
     channels: List[ChannelConfig]
@@ -89,13 +201,16 @@ class AppConfig(BaseModel):
         description="LLM model to use",
     )
     max_messages_per_check: int = Field(
-        default=50, description="Maximum messages to fetch per channel per check"
+        default=50,
+        description="Maximum messages to backfill per channel on the first check",
     )
 
 
 # Global configuration
+@functools.lru_cache(maxsize=1)
 def load_config() -> AppConfig:
-    """Load configuration from environment variables and defaults"""
+    """Load configuration from environment variables and defaults (cached)"""
+    env = os.environ
 
     # Default channels for testing - replace with actual channel names
     default_channels = [
@@ -112,12 +227,12 @@ def load_config() -> AppConfig:
     ]
 
     return AppConfig(
-        telegram_api_id=int(os.getenv("TELEGRAM_API_ID", "0")),
-        telegram_api_hash=os.getenv("TELEGRAM_API_HASH", ""),
+        telegram_api_id=int(env.get("TELEGRAM_API_ID", "0")),
+        telegram_api_hash=env.get("TELEGRAM_API_HASH", ""),
         channels=default_channels,
-        interval_minutes=int(os.getenv("INTERVAL_MINUTES", "5")),
-        llm_model=os.getenv("LLM_MODEL", "groq:llama3-groq-70b-8192-tool-use-preview"),
-        max_messages_per_check=int(os.getenv("MAX_MESSAGES_PER_CHECK", "50")),
+        interval_minutes=int(env.get("INTERVAL_MINUTES", "5")),
+        llm_model=env.get("LLM_MODEL", "groq:llama3-groq-70b-8192-tool-use-preview"),
+        max_messages_per_check=int(env.get("MAX_MESSAGES_PER_CHECK", "50")),
     )
 
 
@@ -127,11 +242,51 @@ class TelegramNewsMonitor:
     def __init__(self, config: AppConfig):
         self.config = config
         self.client = None
+        # Channels never change at runtime, so split them by affiliation once
+        self._right_channels = tuple(
+            c for c in config.channels if c.affiliation == "right-wing"
+        )
+        self._left_channels = tuple(
+            c for c in config.channels if c.affiliation == "left-wing"
+        )
+        # tg_chan_name -> index into a (right-wing, left-wing) batch pair
+        self._side_by_channel: Dict[str, int] = {
+            c.tg_chan_name: side
+            for side, channels in enumerate((self._right_channels, self._left_channels))
+            for c in channels
+        }
         self.last_check_time = datetime.now(timezone.utc) - timedelta(
             hours=1
         )  # Start with 1 hour ago
         self.topic_detection_agent = self._create_topic_detection_agent()
         self.detected_topics: Dict[str, DetectedTopic] = {}  # topic_id -> DetectedTopic
+        self._topics_view = MappingProxyType(self.detected_topics)
+        self._topic_name_index: Dict[str, str] = {}  # topic_name.lower() -> topic_id
+        self._peers: Dict[str, InputPeerChannel] = {}  # tg_chan_name -> input peer
+        self._channel_by_peer_id: Dict[int, ChannelConfig] = {}  # marked peer id
+        self._fetch_sem = asyncio.Semaphore(8)  # Bound concurrent channel fetches
+        # (channel, msg) pairs pushed by NewMessage events
+        self._message_q: asyncio.Queue = asyncio.Queue()
+        # (right-wing, left-wing) MessageBatch pairs waiting for topic detection
+        self._analyze_q: asyncio.Queue = asyncio.Queue(maxsize=4)
+        # Deferred until there is enough text to analyze
+        self._pending_right = MessageBatch()
+        self._pending_left = MessageBatch()
+        # (tg_chan_name, msg id) -> message date, for cross-cycle deduplication
+        self._seen_msg_ids: Dict[Tuple[str, int], datetime] = {}
+        self._llm_sem = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self._llm_throttler = Throttler(
+            rate_limit=LLM_RATE_LIMIT, period=LLM_RATE_PERIOD, retry_interval=0.5
+        )
+        self._tokenizer = None  # Loaded by initialize(), else on first prompt
+        self._tokenizer_enabled = tiktoken is not None
+        self._embedder = None  # Loaded lazily on first topic detection
+        self._embedder_lock = asyncio.Lock()  # Concurrent pairs load it only once
+        self._sem_cache_enabled = SentenceTransformer is not None
+        # (right-side embedding, left-side embedding, result), oldest first
+        self._sem_cache: List[
+            Tuple["np.ndarray", "np.ndarray", TopicDetectionResult]
+        ] = []
 
     def _create_topic_detection_agent(self) -> Agent:
         """Create PydanticAI agent for topic detection only"""
@@ -172,248 +327,613 @@ class TelegramNewsMonitor:
             )
             await self.client.start()
             logger.info("Telegram client initialized successfully")
+
+            # Resolve channels once; the SQLite session keeps them across restarts
+            for channel in self.config.channels:
+                try:
+                    peer = await self.client.get_input_entity(channel.tg_chan_name)
+                    self._peers[channel.tg_chan_name] = peer
+                    self._channel_by_peer_id[utils.get_peer_id(peer)] = channel
+                except Exception as e:
+                    logger.error(f"Failed to resolve @{channel.tg_chan_name}: {e}")
+
+            # Fetch the tokenizer's BPE file now, not on the loop at the first prompt
+            await asyncio.get_running_loop().run_in_executor(None, self._get_tokenizer)
+
+            @self.client.on(events.NewMessage(chats=self._live_chats()))
+            async def _on_new_message(event):
+                msg = event.message
+                if not msg.text or len(msg.text.strip()) <= 10:
+                    return  # Filter out very short messages
+
+                # chat_id is already on the update, so no get_chat() round trip
+                channel = self._channel_by_peer_id.get(event.chat_id)
+                if channel is None or not self._mark_seen(channel, msg):
+                    return
+
+                # Messages also returned by the backfill are caught by _mark_seen
+                self._message_q.put_nowait((channel, msg))
+
         except Exception as e:
             logger.error(f"Failed to initialize Telegram client: {e}")
             raise
 
-    async def fetch_recent_messages(self) -> List[TelegramMessage]:
-        """Fetch recent messages from all configured channels"""
-        all_messages = []
+    def _live_chats(self) -> List[InputPeerChannel]:
+        """Resolved peers for the NewMessage filter, skipping unresolved channels"""
+        # Telethon re-resolves the whole filter on every update until all of it
+        # resolves, so one bad username would block live delivery for every channel
+        skipped = [
+            c.tg_chan_name
+            for c in self.config.channels
+            if c.tg_chan_name not in self._peers
+        ]
+        if skipped:
+            logger.warning(
+                f"No live updates for unresolved channels: {', '.join('@' + name for name in skipped)}"
+            )
+        return list(self._peers.values())
 
-        for channel in self.config.channels:
+    async def fetch_recent_messages(self) -> Tuple[MessageBatch, MessageBatch]:
+        """Backfill messages since the last check as (right-wing, left-wing)"""
+
+        async def _fetch_one(
+            channel: ChannelConfig,
+        ) -> Tuple[ChannelConfig, List[Message]]:
+            channel_messages = []
             try:
-                logger.info(
-                    f"Fetching messages from {channel.name} (@{channel.tg_chan_name})"
-                )
+                async with self._fetch_sem:
+                    logger.info(
+                        f"Fetching messages from {channel.name} (@{channel.tg_chan_name})"
+                    )
 
-                # Get the channel entity
-                entity = await self.client.get_entity(channel.tg_chan_name)
+                    # Use the pre-resolved peer, resolving now only if that failed
+                    peer = self._peers.get(channel.tg_chan_name)
+                    if peer is None:
+                        peer = await self.client.get_input_entity(channel.tg_chan_name)
+                        self._peers[channel.tg_chan_name] = peer
 
-                # Fetch recent messages
-                messages = await self.client.get_messages(
-                    entity, limit=self.config.max_messages_per_check
-                )
+                    # Backfill the newest messages since the last check
+                    messages = await self.client.get_messages(
+                        peer, limit=self.config.max_messages_per_check
+                    )
 
-                # Filter messages since last check and convert to our model
                 for msg in messages:
                     if (
                         msg.date > self.last_check_time
                         and msg.text
                         and len(msg.text.strip()) > 10
-                    ):  # Filter out very short messages
-
-                        telegram_msg = TelegramMessage(
-                            id=msg.id,
-                            text=msg.text,
-                            timestamp=msg.date,
-                            channel_name=channel.name,
-                            channel_affiliation=channel.affiliation,
-                        )
-                        all_messages.append(telegram_msg)
+                        and self._mark_seen(channel, msg)
+                    ):  # Filter out older, very short and already seen messages
+                        channel_messages.append(msg)
 
                 logger.info(
-                    f"Fetched {len([m for m in all_messages if m.channel_name == channel.name])} new messages from {channel.name}"
+                    f"Fetched {len(channel_messages)} new messages from {channel.name}"
                 )
 
             except Exception as e:
                 logger.error(f"Error fetching messages from {channel.name}: {e}")
-                continue
 
-        return all_messages
+            return channel, channel_messages
+
+        results = await asyncio.gather(
+            *[_fetch_one(c) for c in self._right_channels + self._left_channels],
+            return_exceptions=True,
+        )
+
+        # Results come back in channel order: all right-wing, then all left-wing
+        right_batch, left_batch = MessageBatch(), MessageBatch()
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"Unexpected error fetching channel: {result}")
+                continue
+            batch = right_batch if i < len(self._right_channels) else left_batch
+            channel, channel_messages = result
+            for msg in channel_messages:
+                batch.append(channel, msg)
+
+        return right_batch, left_batch
+
+    def _mark_seen(self, channel: ChannelConfig, msg: Message) -> bool:
+        """Record a Telethon message as seen; False if it was seen before"""
+        key = (channel.tg_chan_name, msg.id)
+        if key in self._seen_msg_ids:
+            return False
+        self._seen_msg_ids[key] = msg.date
+        return True
+
+    def _prune_seen_messages(self, cutoff_time: datetime) -> int:
+        """Forget seen message ids older than the cutoff to bound memory"""
+        stale = [key for key, date in self._seen_msg_ids.items() if date < cutoff_time]
+        for key in stale:
+            del self._seen_msg_ids[key]
+        return len(stale)
 
     async def detect_mutual_topics(
-        self, messages: List[TelegramMessage]
-    ) -> Optional[str]:
-        """Detect mutual topics and store messages by topic"""
-        if not messages:
+        self, right_batch: MessageBatch, left_batch: MessageBatch
+    ) -> Optional[List[str]]:
+        """Detect mutual topics per channel pair; None if the batch was deferred"""
+        if not right_batch and not left_batch:
             logger.info("No messages to analyze")
-            return None
+            return []
 
-        # Group messages by political affiliation
-        right_wing_msgs = [
-            msg for msg in messages if msg.channel_affiliation == "right-wing"
-        ]
-        left_wing_msgs = [
-            msg for msg in messages if msg.channel_affiliation == "left-wing"
-        ]
+        # Fold in messages deferred from earlier batches
+        if self._pending_right or self._pending_left:
+            self._pending_right.extend(right_batch)
+            self._pending_left.extend(left_batch)
+            right_batch, self._pending_right = self._pending_right, MessageBatch()
+            left_batch, self._pending_left = self._pending_left, MessageBatch()
 
-        if not right_wing_msgs or not left_wing_msgs:
+        if not self._has_enough_evidence(right_batch.texts + left_batch.texts):
             logger.info(
-                "Need messages from both right-wing and left-wing channels for analysis"
+                f"Too little text to analyze, deferring {len(right_batch) + len(left_batch)} messages to the next batch"
             )
+            self._pending_right, self._pending_left = right_batch, left_batch
             return None
 
+        if not right_batch or not left_batch:
+            logger.info(
+                "Need messages from both right-wing and left-wing channels for analysis"
+            )
+            return []
+
+        right_groups = self._group_by_channel(right_batch)
+        left_groups = self._group_by_channel(left_batch)
+        pairs = [
+            (right_groups[right.name], left_groups[left.name])
+            for right in self._right_channels
+            if right.name in right_groups
+            for left in self._left_channels
+            if left.name in left_groups
+        ]
         logger.info(
-            f"Detecting topics in {len(right_wing_msgs)} right-wing and {len(left_wing_msgs)} left-wing messages"
+            f"Detecting topics across {len(pairs)} channel pairs "
+            f"({len(right_batch)} right-wing, {len(left_batch)} left-wing messages)"
         )
 
-        try:
-            # Run topic detection
-            result = await self.topic_detection_agent.run(
-                f"""
-                זהה נושא משותף בהודעות הללו:
-                
-                הודעות ימין:
-                {chr(10).join(f"- {msg.text}" for msg in right_wing_msgs[:10])}
-                
-                הודעות שמאל:
-                {chr(10).join(f"- {msg.text}" for msg in left_wing_msgs[:10])}
-                
-                האם יש נושא אחד שנדון בשני הצדדים? אם כן, תן לו שם קצר בעברית.
-                """
+        right_texts, left_texts = right_batch.texts, left_batch.texts
+        results = await asyncio.gather(
+            *[
+                self._detect_topic(
+                    [right_texts[i] for i in right_idx],
+                    [left_texts[i] for i in left_idx],
+                )
+                for right_idx, left_idx in pairs
+            ],
+            return_exceptions=True,
+        )
+
+        # Merge sequentially so topic creation never races on the name index
+        topic_ids: List[str] = []
+        for (right_idx, left_idx), detection_result in zip(pairs, results):
+            if isinstance(detection_result, BaseException):
+                logger.error(f"Error during topic detection: {detection_result}")
+                continue
+            if not detection_result:
+                continue
+
+            topic_id = self._store_topic(
+                detection_result,
+                [right_batch.message(i) for i in right_idx],
+                [left_batch.message(i) for i in left_idx],
             )
+            if topic_id not in topic_ids:
+                topic_ids.append(topic_id)
+
+        if not topic_ids:
+            logger.info("No mutual topic detected")
+        return topic_ids
+
+    @staticmethod
+    def _group_by_channel(batch: MessageBatch) -> Dict[str, List[int]]:
+        """Row indices of a batch, keyed by channel name"""
+        by_channel: Dict[str, List[int]] = defaultdict(list)
+        for i, channel_name in enumerate(batch.channels):
+            by_channel[channel_name].append(i)
+        return by_channel
+
+    async def _detect_topic(
+        self, right_texts: List[str], left_texts: List[str]
+    ) -> Optional[TopicDetectionResult]:
+        """Ask the agent whether one right/left channel pair shares a topic"""
+        try:
+            right_lines = self._pack_messages(right_texts, PROMPT_TOKEN_BUDGET)
+            left_lines = self._pack_messages(left_texts, PROMPT_TOKEN_BUDGET)
 
-            detection_result = result.data
+            # Skip the LLM when the text it would see clearly shares no vocabulary
+            shared = self._shared_terms(right_lines, left_lines)
+            if shared < MIN_SHARED_TERMS:
+                logger.info(f"Only {shared} shared terms, skipping detection")
+                return None
 
-            if detection_result.has_mutual_topic and detection_result.topic_name:
-                # Create or update topic
-                topic_id = self._get_or_create_topic_id(detection_result.topic_name)
-
-                if topic_id in self.detected_topics:
-                    # Update existing topic
-                    topic = self.detected_topics[topic_id]
-                    topic.right_wing_messages.extend(right_wing_msgs)
-                    topic.left_wing_messages.extend(left_wing_msgs)
-                    topic.last_updated = datetime.now(timezone.utc)
-                    logger.info(
-                        f"Updated existing topic: {topic.topic_name} (ID: {topic_id})"
-                    )
-                else:
-                    # Create new topic
-                    topic = DetectedTopic(
-                        topic_id=topic_id,
-                        topic_name=detection_result.topic_name,
-                        right_wing_messages=right_wing_msgs,
-                        left_wing_messages=left_wing_msgs,
-                        confidence_score=detection_result.confidence_score or 0.8,
-                    )
-                    self.detected_topics[topic_id] = topic
-                    logger.info(
-                        f"Detected new topic: {topic.topic_name} (ID: {topic_id})"
-                    )
+            prompt = _PROMPT_TEMPLATE.format_map(
+                {
+                    "right_block": "\n".join(right_lines),
+                    "left_block": "\n".join(left_lines),
+                }
+            )
 
-                return topic_id
+            # Reuse the result for earlier messages on both sides if we have one
+            embedding = await self._embed_sides(right_lines, left_lines)
+            detection_result = self._lookup_semantic_cache(embedding)
+
+            if detection_result is None:
+                # Run topic detection within the provider's rate limits
+                async with self._llm_sem:
+                    async with self._llm_throttler:
+                        result = await self.topic_detection_agent.run(prompt)
+                detection_result = result.data
+                self._store_semantic_cache(embedding, detection_result)
             else:
-                logger.info("No mutual topic detected")
-                return None
+                logger.info("Semantic cache hit, skipping topic detection call")
+
+            if detection_result.has_mutual_topic and detection_result.topic_name:
+                return detection_result
+            return None
 
         except Exception as e:
             logger.error(f"Error during topic detection: {e}")
             return None
 
+    def _store_topic(
+        self,
+        detection_result: TopicDetectionResult,
+        right_wing_msgs: List[TelegramMessage],
+        left_wing_msgs: List[TelegramMessage],
+    ) -> str:
+        """Create or update the topic for a detection result; returns its ID"""
+        topic_id = self._get_or_create_topic_id(detection_result.topic_name)
+
+        if topic_id in self.detected_topics:
+            # Update existing topic
+            topic = self.detected_topics[topic_id]
+            self._extend_unique(topic.right_wing_messages, right_wing_msgs)
+            self._extend_unique(topic.left_wing_messages, left_wing_msgs)
+            topic.last_updated = datetime.now(timezone.utc)
+            logger.info(f"Updated existing topic: {topic.topic_name} (ID: {topic_id})")
+        else:
+            # Create new topic
+            topic = DetectedTopic(
+                topic_id=topic_id,
+                topic_name=detection_result.topic_name,
+                right_wing_messages=right_wing_msgs,
+                left_wing_messages=left_wing_msgs,
+                confidence_score=detection_result.confidence_score or 0.8,
+            )
+            self.detected_topics[topic_id] = topic
+            self._topic_name_index[topic.topic_name.lower()] = topic_id
+            logger.info(f"Detected new topic: {topic.topic_name} (ID: {topic_id})")
+
+        self._trim_topic(topic)
+        return topic_id
+
+    @staticmethod
+    def _trim_topic(topic: DetectedTopic, cap: int = TOPIC_MESSAGE_CAP):
+        """Keep only the most recent messages on each side of a topic"""
+        if len(topic.right_wing_messages) > cap:
+            del topic.right_wing_messages[:-cap]
+        if len(topic.left_wing_messages) > cap:
+            del topic.left_wing_messages[:-cap]
+
+    def _get_tokenizer(self):
+        """Return the prompt tokenizer, or None to fall back to character counts"""
+        if self._tokenizer is None and self._tokenizer_enabled:
+            try:
+                self._tokenizer = tiktoken.get_encoding(PROMPT_TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"Counting prompt characters, tokenizer failed: {e}")
+                self._tokenizer_enabled = False
+        return self._tokenizer
+
+    def _count_tokens(self, text: str) -> int:
+        """Count prompt tokens, or characters if no tokenizer is available"""
+        tokenizer = self._get_tokenizer()
+        return len(tokenizer.encode(text)) if tokenizer else len(text)
+
+    def _has_enough_evidence(self, texts: Iterable[str]) -> bool:
+        """Whether the texts add up to at least PROMPT_MIN_TOKENS tokens"""
+        total = 0
+        for text in texts:
+            total += self._count_tokens(text)
+            if total >= PROMPT_MIN_TOKENS:
+                return True
+        return False
+
+    @staticmethod
+    def _shared_terms(right_lines: List[str], left_lines: List[str]) -> int:
+        """Count the words (longer than 3 chars) that appear on both sides"""
+
+        def terms(lines: List[str]) -> Set[str]:
+            words = (w.strip(_TERM_PUNCTUATION) for line in lines for w in line.split())
+            return {w for w in words if len(w) > 3}
+
+        # Unlike Jaccard, the count doesn't shrink as busy windows add vocabulary
+        return len(terms(right_lines) & terms(left_lines))
+
+    def _pack_messages(self, texts: Iterable[str], budget_tokens: int) -> List[str]:
+        """Pick message lines for the prompt until the token budget is spent"""
+        tokenizer = self._get_tokenizer()
+        lines = []
+        used = 0
+
+        for text in texts:
+            line = "- " + text
+            # Approximate the combined count by summing lines plus newlines
+            cost = self._count_tokens(line) + 1
+            if used + cost > budget_tokens:
+                if not lines:
+                    # Always keep some evidence: truncate the first message
+                    if tokenizer:
+                        line = tokenizer.decode(tokenizer.encode(line)[:budget_tokens])
+                    else:
+                        line = line[:budget_tokens]
+                    lines.append(line)
+                break
+            lines.append(line)
+            used += cost
+
+        return lines
+
+    @staticmethod
+    def _extend_unique(
+        existing: List[TelegramMessage], new_messages: List[TelegramMessage]
+    ):
+        """Append messages to a topic list, skipping ones it already holds"""
+        seen = {(msg.channel_name, msg.id) for msg in existing}
+        for msg in new_messages:
+            key = (msg.channel_name, msg.id)
+            if key not in seen:
+                seen.add(key)
+                existing.append(msg)
+
+    async def _embed_sides(
+        self, right_lines: List[str], left_lines: List[str]
+    ) -> Optional[Tuple["np.ndarray", "np.ndarray"]]:
+        """Embed each side's messages for the semantic cache, or None if it's off"""
+        if not self._sem_cache_enabled:
+            return None
+
+        # Loading and encoding are CPU-bound, so keep them off the event loop
+        loop = asyncio.get_running_loop()
+        try:
+            if self._embedder is None:
+                async with self._embedder_lock:
+                    if self._embedder is None:
+                        self._embedder = await loop.run_in_executor(
+                            None, SentenceTransformer, SEMANTIC_CACHE_MODEL
+                        )
+            # One input per message keeps each within the model's max_seq_length,
+            # so no side is cut off; each side is the mean of its messages
+            vectors = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    self._embedder.encode,
+                    right_lines + left_lines,
+                    normalize_embeddings=True,
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"Disabling semantic cache, embedding failed: {e}")
+            self._sem_cache_enabled = False
+            return None
+
+        right = vectors[: len(right_lines)].mean(axis=0)
+        left = vectors[len(right_lines) :].mean(axis=0)
+        return right / np.linalg.norm(right), left / np.linalg.norm(left)
+
+    def _lookup_semantic_cache(
+        self, embedding: Optional[Tuple["np.ndarray", "np.ndarray"]]
+    ) -> Optional[TopicDetectionResult]:
+        """Return a cached result whose right and left sides both match this one"""
+        if embedding is None or not self._sem_cache:
+            return None
+
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        right_emb, left_emb = embedding
+        right_scores = np.stack([right for right, _, _ in self._sem_cache]) @ right_emb
+        left_scores = np.stack([left for _, left, _ in self._sem_cache]) @ left_emb
+        scores = np.minimum(right_scores, left_scores)
+        best = int(np.argmax(scores))
+        if scores[best] < SEMANTIC_CACHE_THRESHOLD:
+            return None
+
+        # Move the hit to the end so eviction drops the least recently used
+        entry = self._sem_cache.pop(best)
+        self._sem_cache.append(entry)
+        return entry[2]
+
+    def _store_semantic_cache(
+        self,
+        embedding: Optional[Tuple["np.ndarray", "np.ndarray"]],
+        result: TopicDetectionResult,
+    ):
+        """Remember a detection result, evicting the least recently used entry"""
+        if embedding is None:
+            return
+
+        self._sem_cache.append((*embedding, result))
+        if len(self._sem_cache) > SEMANTIC_CACHE_SIZE:
+            self._sem_cache.pop(0)
+
     def _get_or_create_topic_id(self, topic_name: str) -> str:
         """Get existing topic ID or create new one based on topic name"""
-        # Check if we already have a similar topic
-        for topic_id, topic in self.detected_topics.items():
-            if topic.topic_name.lower() == topic_name.lower():
-                return topic_id
-
-        # Create new topic ID
-        return str(uuid.uuid4())[:8]  # Short UUID
+        # Reuse the ID of a topic with the same name, else a new short UUID
+        return self._topic_name_index.get(topic_name.lower()) or str(uuid.uuid4())[:8]
 
     def get_topic_data(self, topic_id: str) -> Optional[DetectedTopic]:
         """Get topic data for external processing (e.g., summarization)"""
         return self.detected_topics.get(topic_id)
 
-    def get_all_topics(self) -> Dict[str, DetectedTopic]:
-        """Get all detected topics"""
-        return self.detected_topics.copy()
+    def get_all_topics(self) -> Mapping[str, DetectedTopic]:
+        """Get a live read-only view of all detected topics (dict() it to copy)"""
+        return self._topics_view
 
-    def clear_old_topics(self, hours_old: int = 24):
+    def clear_old_topics(self, hours_old: int = TOPIC_RETENTION_HOURS):
         """Clear topics older than specified hours"""
         cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours_old)
-        topics_to_remove = [
-            topic_id
-            for topic_id, topic in self.detected_topics.items()
-            if topic.last_updated < cutoff_time
-        ]
+        topics = self.detected_topics
+        name_index = self._topic_name_index
+        removed = 0
 
-        for topic_id in topics_to_remove:
-            removed_topic = self.detected_topics.pop(topic_id)
-            logger.info(
-                f"Removed old topic: {removed_topic.topic_name} (ID: {topic_id})"
-            )
+        for topic_id, topic in list(topics.items()):
+            if topic.last_updated < cutoff_time:
+                del topics[topic_id]
+                name_index.pop(topic.topic_name.lower(), None)
+                removed += 1
+                logger.info(f"Removed old topic: {topic.topic_name} (ID: {topic_id})")
 
-        return len(topics_to_remove)
+        self._prune_seen_messages(cutoff_time)
+
+        return removed
 
     def display_topic_detection(self, topic_id: Optional[str]):
         """Display topic detection results"""
-        if topic_id and topic_id in self.detected_topics:
-            topic = self.detected_topics[topic_id]
-            print("\n" + "=" * 80)
-            print("🔥 MUTUAL TOPIC DETECTED 🔥")
-            print("=" * 80)
-            print(f"📋 Topic ID: {topic.topic_id}")
-            print(f"📰 Topic Name: {topic.topic_name}")
-            print(f"➡️  Right-wing messages: {len(topic.right_wing_messages)}")
-            print(f"⬅️  Left-wing messages: {len(topic.left_wing_messages)}")
-            print(f"🎯 Confidence: {topic.confidence_score:.2f}")
-            print(f"🕐 First detected: {topic.first_detected.strftime('%H:%M:%S')}")
-            print(f"🕐 Last updated: {topic.last_updated.strftime('%H:%M:%S')}")
-            print("=" * 80)
+        topic = self.detected_topics.get(topic_id) if topic_id else None
+        if topic is not None:
+            separator = "=" * 80
+            parts = [
+                "\n" + separator,
+                "🔥 MUTUAL TOPIC DETECTED 🔥",
+                separator,
+                f"📋 Topic ID: {topic.topic_id}",
+                f"📰 Topic Name: {topic.topic_name}",
+                f"➡️  Right-wing messages: {len(topic.right_wing_messages)}",
+                f"⬅️  Left-wing messages: {len(topic.left_wing_messages)}",
+                f"🎯 Confidence: {topic.confidence_score:.2f}",
+                f"🕐 First detected: {topic.first_detected:%H:%M:%S}",
+                f"🕐 Last updated: {topic.last_updated:%H:%M:%S}",
+                separator,
+            ]
+            sys.stdout.write("\n".join(parts) + "\n")
 
             # Log the result
             logger.info(f"Topic detected/updated: {topic.topic_name} (ID: {topic_id})")
         else:
-            print(
-                f"⏰ {datetime.now().strftime('%H:%M:%S')} - No mutual topics found in recent messages"
+            sys.stdout.write(
+                f"⏰ {datetime.now():%H:%M:%S} - No mutual topics found in recent messages\n"
             )
             logger.info("No mutual topics identified in current analysis")
 
     def display_topics_summary(self):
         """Display summary of all detected topics"""
-        if not self.detected_topics:
-            print("📊 No topics detected yet")
+        topics = self.detected_topics
+        if not topics:
+            sys.stdout.write("📊 No topics detected yet\n")
             return
 
-        print(f"\n📊 TOPICS SUMMARY ({len(self.detected_topics)} topics)")
-        print("-" * 60)
-        for topic_id, topic in self.detected_topics.items():
-            total_messages = len(topic.right_wing_messages) + len(
-                topic.left_wing_messages
-            )
-            print(f"🏷️  {topic.topic_name} (ID: {topic_id})")
-            print(
-                f"   📊 {total_messages} messages ({len(topic.right_wing_messages)} right, {len(topic.left_wing_messages)} left)"
-            )
-            print(f"   🕐 Last updated: {topic.last_updated.strftime('%H:%M:%S')}")
-            print()
+        parts = [f"\n📊 TOPICS SUMMARY ({len(topics)} topics)", "-" * 60]
+        for topic_id, topic in topics.items():
+            right_count = len(topic.right_wing_messages)
+            left_count = len(topic.left_wing_messages)
+            parts += [
+                f"🏷️  {topic.topic_name} (ID: {topic_id})",
+                f"   📊 {right_count + left_count} messages ({right_count} right, {left_count} left)",
+                f"   🕐 Last updated: {topic.last_updated:%H:%M:%S}",
+                "",
+            ]
+        sys.stdout.write("\n".join(parts) + "\n")
+
+    async def process_messages(
+        self, right_batch: MessageBatch, left_batch: MessageBatch
+    ):
+        """Analyze right-wing and left-wing batches and display the results"""
+        if not right_batch and not left_batch:
+            logger.info("No new messages found")
+            # Still show summary if we have topics
+            if self.detected_topics:
+                self.display_topics_summary()
+            return
 
-    async def run_monitoring_cycle(self):
-        """Run one complete monitoring cycle"""
+        # Detect mutual topics
+        topic_ids = await self.detect_mutual_topics(right_batch, left_batch)
+        if topic_ids is None:
+            return  # Deferred, so nothing was analyzed to report on
+
+        # Display results
+        for topic_id in topic_ids or [None]:
+            self.display_topic_detection(topic_id)
+
+        # Show summary every few cycles
+        if len(self.detected_topics) > 0:
+            self.display_topics_summary()
+
+    def _enqueue_batches(self, right_batch: MessageBatch, left_batch: MessageBatch):
+        """Hand batches to the analyzer, dropping the oldest pair if it lags"""
         try:
-            # Fetch recent messages
-            messages = await self.fetch_recent_messages()
+            self._analyze_q.put_nowait((right_batch, left_batch))
+        except asyncio.QueueFull:
+            dropped_right, dropped_left = self._analyze_q.get_nowait()
+            logger.warning(
+                f"Analysis is falling behind, dropped a batch of {len(dropped_right) + len(dropped_left)} messages"
+            )
+            self._analyze_q.put_nowait((right_batch, left_batch))
+
+    async def _fetch_loop(self):
+        """Backfill once, then collect pushed messages in tumbling windows"""
+        window_seconds = self.config.interval_minutes * 60
 
-            # Update last check time
+        # Catch up on messages posted before we started listening
+        try:
+            right_batch, left_batch = await self.fetch_recent_messages()
             self.last_check_time = datetime.now(timezone.utc)
+            self._enqueue_batches(right_batch, left_batch)
+        except Exception as e:
+            logger.error(f"Error during startup backfill: {e}")
 
-            if not messages:
-                logger.info("No new messages found")
-                # Still show summary if we have topics
-                if self.detected_topics:
-                    self.display_topics_summary()
-                return
+        while True:
+            try:
+                # The window opens with the first message that arrives
+                batches = (MessageBatch(), MessageBatch())  # (right-wing, left-wing)
+                channel, msg = await self._message_q.get()
+                deadline = time.monotonic() + window_seconds
+
+                while True:
+                    batches[self._side_by_channel[channel.tg_chan_name]].append(
+                        channel, msg
+                    )
 
-            # Detect mutual topics
-            topic_id = await self.detect_mutual_topics(messages)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        channel, msg = await asyncio.wait_for(
+                            self._message_q.get(), timeout=remaining
+                        )
+                    except asyncio.TimeoutError:
+                        break
 
-            # Display results
-            self.display_topic_detection(topic_id)
+                self.last_check_time = datetime.now(timezone.utc)
+                self._enqueue_batches(*batches)
 
-            # Show summary every few cycles
-            if len(self.detected_topics) > 0:
-                self.display_topics_summary()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error in fetch loop: {e}")
+                # Wait a bit before retrying
+                await asyncio.sleep(30)
 
-        except Exception as e:
-            logger.error(f"Error in monitoring cycle: {e}")
+    async def _analyze_loop(self):
+        """Analyze collected batches without holding up message collection"""
+        while True:
+            try:
+                right_batch, left_batch = await self._analyze_q.get()
+                await self.process_messages(right_batch, left_batch)
+
+                # Seen ids only need to outlive the default topic retention
+                self._prune_seen_messages(
+                    datetime.now(timezone.utc) - timedelta(hours=TOPIC_RETENTION_HOURS)
+                )
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error in analysis loop: {e}")
 
     async def start_monitoring(self):
-        """Start the continuous monitoring loop"""
+        """Backfill once, then analyze pushed messages until disconnected"""
         logger.info(
             f"Starting news monitoring with {len(self.config.channels)} channels"
         )
-        logger.info(f"Monitoring interval: {self.config.interval_minutes} minutes")
+        logger.info(f"Batch window: {self.config.interval_minutes} minutes")
 
         print(f"🚀 Starting Telegram News Monitor")
         print(f"📺 Monitoring {len(self.config.channels)} channels:")
@@ -421,24 +941,20 @@ class TelegramNewsMonitor:
             print(
                 f"   - {channel.name} (@{channel.tg_chan_name}) [{channel.affiliation}]"
             )
-        print(f"⏱️  Check interval: {self.config.interval_minutes} minutes")
+        print(f"⏱️  Batch window: {self.config.interval_minutes} minutes")
         print(f"🤖 Using model: {self.config.llm_model}")
         print("-" * 60)
 
-        while True:
+        # Collection and analysis run side by side, decoupled by _analyze_q
+        workers = asyncio.gather(self._fetch_loop(), self._analyze_loop())
+        try:
+            await self.client.run_until_disconnected()
+        finally:
+            workers.cancel()
             try:
-                await self.run_monitoring_cycle()
-
-                # Wait for the next cycle
-                await asyncio.sleep(self.config.interval_minutes * 60)
-
-            except KeyboardInterrupt:
-                logger.info("Monitoring stopped by user")
-                break
-            except Exception as e:
-                logger.error(f"Unexpected error in monitoring loop: {e}")
-                # Wait a bit before retrying
-                await asyncio.sleep(30)
+                await workers
+            except asyncio.CancelledError:
+                pass
 
     async def cleanup(self):
         """Clean up resources"""
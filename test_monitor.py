@@ -6,16 +6,37 @@ Demonstrates model validation and basic functionality
 
 import asyncio
 from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from telethon import events, utils
+from telethon.tl.types import InputPeerChannel
+
+try:  # Optional, as in telegram_news_monitor
+    import numpy as np
+except ImportError:
+    np = None
+
 from telegram_news_monitor import (
     ChannelConfig,
     TelegramMessage,
     TopicDetectionResult,
     DetectedTopic,
     AppConfig,
+    MessageBatch,
+    TelegramNewsMonitor,
     load_config,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
 )
 
 
+class OfflineMonitor(TelegramNewsMonitor):
+    """Monitor without an LLM agent, for exercising local helpers"""
+
+    def _create_topic_detection_agent(self):
+        return None
+
+
 def test_pydantic_models():
     """Test Pydantic model validation"""
     print("Testing Pydantic Models...")
@@ -100,6 +121,14 @@ def test_configuration():
         print(f"❌ Configuration error: {e}")
 
 
+def test_load_config_is_cached():
+    """Test that load_config returns the same instance on repeated calls"""
+    print("\nTesting Configuration Cache...")
+
+    assert load_config() is load_config()
+    print("✅ Config is cached between calls")
+
+
 def test_data_flow():
     """Test data flow simulation"""
     print("\nTesting Data Flow...")
@@ -167,13 +196,242 @@ def test_data_flow():
     )
 
 
+def test_topic_message_lists():
+    """Test that topic message lists stay deduplicated and bounded"""
+    print("\nTesting Topic Message Lists...")
+
+    def make_message(msg_id, channel_name):
+        return TelegramMessage(
+            id=msg_id,
+            text="הודעה על נושא חדשותי מתפתח",  # Hebrew message
+            timestamp=datetime.now(),
+            channel_name=channel_name,
+            channel_affiliation="right-wing",
+        )
+
+    existing = [make_message(1, "Right Wing News")]
+    TelegramNewsMonitor._extend_unique(
+        existing,
+        [
+            make_message(1, "Right Wing News"),  # Already stored
+            make_message(1, "Other Right Wing News"),  # Same id, other channel
+            make_message(2, "Right Wing News"),
+            make_message(2, "Right Wing News"),  # Repeated within the batch
+        ],
+    )
+
+    keys = [(m.channel_name, m.id) for m in existing]
+    assert keys == [
+        ("Right Wing News", 1),
+        ("Other Right Wing News", 1),
+        ("Right Wing News", 2),
+    ]
+    print(f"✅ Topic holds {len(existing)} unique messages")
+
+    # Long-lived topics keep only their most recent messages
+    topic = DetectedTopic(
+        topic_id="dedup01",
+        topic_name="נושא מתפתח",
+        right_wing_messages=[make_message(i, "Right Wing News") for i in range(5)],
+        confidence_score=0.8,
+    )
+    TelegramNewsMonitor._trim_topic(topic, cap=3)
+    assert [m.id for m in topic.right_wing_messages] == [2, 3, 4]
+    print(f"✅ Topic trimmed to {len(topic.right_wing_messages)} recent messages")
+
+
+def test_message_batch():
+    """Test column-oriented message batches"""
+    print("\nTesting Message Batch...")
+
+    channel = ChannelConfig(
+        name="Left Wing News", tg_chan_name="left_news", affiliation="left-wing"
+    )
+    now = datetime.now()
+    batch = MessageBatch()
+    batch.append(
+        channel, SimpleNamespace(id=7, text="עדכון חדשות בנושא התקציב", date=now)
+    )
+
+    assert len(batch) == 1
+    message = batch.message(0)
+    assert message.id == 7
+    assert message.timestamp == now
+    assert message.channel_name == "Left Wing News"
+    assert message.channel_affiliation == "left-wing"
+    print(f"✅ MessageBatch row materialized: {message.id} from {message.channel_name}")
+
+
+def test_shared_terms():
+    """Test the shared vocabulary prefilter"""
+    print("\nTesting Shared Terms...")
+
+    shared = TelegramNewsMonitor._shared_terms(
+        ["- הממשלה אישרה את תקציב המדינה."], ["- ביקורת על תקציב המדינה החדש"]
+    )
+    unrelated = TelegramNewsMonitor._shared_terms(
+        ["- הממשלה אישרה את תקציב המדינה"], ["- סערה חזקה צפויה בצפון"]
+    )
+    assert shared == 2  # "תקציב" and "המדינה", ignoring punctuation
+    assert unrelated == 0
+
+    # A busy window: one shared 5-word story among 10 messages of 15 words a side
+    story = "ועדה תקציב המדינה הצבעה כנסת"
+    right = [" ".join(f"ימין{i}_{j}" for j in range(15)) for i in range(9)]
+    left = [" ".join(f"שמאל{i}_{j}" for j in range(15)) for i in range(9)]
+    busy = TelegramNewsMonitor._shared_terms(right + [story], left + [story])
+    assert busy == 5
+    print(f"✅ Shared terms: {shared} related, {unrelated} unrelated, {busy} busy")
+
+
+def test_prompt_packing():
+    """Test that prompt lines respect the token budget"""
+    print("\nTesting Prompt Packing...")
+
+    monitor = OfflineMonitor(load_config())
+    monitor._tokenizer_enabled = False  # Count characters instead of tokens
+
+    # Each line costs len("- " + text) + 1 for the newline
+    lines = monitor._pack_messages(["חדשות", "עדכון", "דיווח"], 16)
+    assert lines == ["- חדשות", "- עדכון"]
+    print(f"✅ Budget cutoff kept {len(lines)} of 3 messages")
+
+    # A first message over budget is truncated rather than dropped
+    lines = monitor._pack_messages(["א" * 50, "קצר"], 10)
+    assert lines == ["- " + "א" * 8]
+    print(f"✅ Oversized first message truncated to {len(lines[0])} chars")
+
+
+def test_low_evidence_deferral():
+    """Test that small batches are deferred and merged into the next one"""
+    print("\nTesting Low-Evidence Deferral...")
+
+    config = load_config()
+    monitor = OfflineMonitor(config)
+    monitor._tokenizer_enabled = False  # Count characters instead of tokens
+    right_channel = next(c for c in config.channels if c.affiliation == "right-wing")
+    left_channel = next(c for c in config.channels if c.affiliation == "left-wing")
+
+    analyzed = []
+
+    async def record_detection(right_texts, left_texts):
+        analyzed.append((right_texts, left_texts))
+        return None
+
+    monitor._detect_topic = record_detection
+
+    def make_batches(msg_id, text):
+        right_batch, left_batch = MessageBatch(), MessageBatch()
+        now = datetime.now()
+        right_batch.append(
+            right_channel, SimpleNamespace(id=msg_id, text=text, date=now)
+        )
+        left_batch.append(left_channel, SimpleNamespace(id=msg_id, text=text, date=now))
+        return right_batch, left_batch
+
+    short = "עדכון קצר על תקציב המדינה"
+    assert not monitor._has_enough_evidence([short, short])
+    result = asyncio.run(monitor.detect_mutual_topics(*make_batches(1, short)))
+    assert result is None  # Deferred, not "no topics found"
+    assert len(monitor._pending_right) == 1 and len(monitor._pending_left) == 1
+    assert not analyzed
+
+    long = "דיון ארוך בכנסת על תקציב המדינה והשלכותיו על משרדי הממשלה " * 2
+    assert monitor._has_enough_evidence([short, long, short, long])
+    result = asyncio.run(monitor.detect_mutual_topics(*make_batches(2, long)))
+    assert result == []
+    assert analyzed == [([short, long], [short, long])]
+    assert not monitor._pending_right and not monitor._pending_left
+    print("✅ Small batch deferred, then analyzed together with the next one")
+
+
+def test_live_chat_filter():
+    """Test that the NewMessage filter skips channels that failed to resolve"""
+    print("\nTesting Live Chat Filter...")
+
+    config = load_config()
+    monitor = OfflineMonitor(config)
+    resolved = config.channels[0]  # The others failed get_input_entity
+    peer = InputPeerChannel(channel_id=123, access_hash=456)
+    monitor._peers[resolved.tg_chan_name] = peer
+
+    chats = monitor._live_chats()
+    assert chats == [peer]
+
+    # Telethon resolves the filter once, without looking up any username
+    async def get_input_entity(entity):
+        if isinstance(entity, str):
+            raise ValueError(f"Cannot find any entity corresponding to {entity}")
+        return entity
+
+    builder = events.NewMessage(chats=chats)
+    asyncio.run(builder.resolve(SimpleNamespace(get_input_entity=get_input_entity)))
+    assert builder.resolved and builder.chats == {utils.get_peer_id(peer)}
+    print(f"✅ Filter holds {len(chats)} of {len(config.channels)} channels")
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+def test_semantic_cache():
+    """Test semantic cache hits, LRU ordering and eviction with stub embeddings"""
+    print("\nTesting Semantic Cache...")
+
+    monitor = OfflineMonitor(load_config())
+    x, y = np.array([1.0, 0.0]), np.array([0.0, 1.0])
+
+    def unit(cos):
+        """Unit vector whose cosine similarity with x is cos"""
+        return np.array([cos, np.sqrt(1 - cos**2)])
+
+    near_x = unit(SEMANTIC_CACHE_THRESHOLD + 0.05)
+    far_x = unit(SEMANTIC_CACHE_THRESHOLD - 0.05)
+    budget = TopicDetectionResult(
+        has_mutual_topic=True, topic_name="תקציב המדינה", confidence_score=0.9
+    )
+    judges = TopicDetectionResult(
+        has_mutual_topic=True, topic_name="חוק השופטים", confidence_score=0.8
+    )
+
+    monitor._store_semantic_cache((x, x), budget)
+    assert monitor._lookup_semantic_cache((near_x, near_x)) is budget
+
+    # Both sides must reach the threshold, not just one of them
+    assert monitor._lookup_semantic_cache((near_x, far_x)) is None
+    assert monitor._lookup_semantic_cache((far_x, near_x)) is None
+    assert monitor._lookup_semantic_cache((x, y)) is None
+    print("✅ Hit only when both sides are similar")
+
+    # A hit moves its entry to the most recently used end
+    monitor._store_semantic_cache((y, y), judges)
+    assert monitor._lookup_semantic_cache((x, x)) is budget
+    assert [entry[2] for entry in monitor._sem_cache] == [judges, budget]
+    print("✅ Hit moved to the most recently used end")
+
+    # Filling past SEMANTIC_CACHE_SIZE evicts the least recently used entry
+    filler = TopicDetectionResult(has_mutual_topic=False)
+    for _ in range(SEMANTIC_CACHE_SIZE - 1):
+        monitor._store_semantic_cache((-x, -y), filler)
+    assert len(monitor._sem_cache) == SEMANTIC_CACHE_SIZE
+    assert monitor._lookup_semantic_cache((y, y)) is None
+    assert monitor._lookup_semantic_cache((x, x)) is budget
+    print(f"✅ Least recently used entry evicted at {SEMANTIC_CACHE_SIZE} entries")
+
+
 if __name__ == "__main__":
     print("🧪 Telegram News Monitor - Test Suite")
     print("=" * 50)
 
     test_pydantic_models()
     test_configuration()
+    test_load_config_is_cached()
     test_data_flow()
+    test_topic_message_lists()
+    test_message_batch()
+    test_shared_terms()
+    test_prompt_packing()
+    test_low_evidence_deferral()
+    test_live_chat_filter()
+    if np is not None:
+        test_semantic_cache()
 
     print("\n" + "=" * 50)
     print("✅ Test suite completed!")